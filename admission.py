@@ -0,0 +1,230 @@
+import os
+import asyncio
+import logging
+from fastapi.responses import ORJSONResponse
+from starlette.routing import Match
+
+logger = logging.getLogger(__name__)
+
+# Route classes, cheapest first
+CLASSES = ("read", "write", "auth", "expensive")
+
+# Default per-class limits: (max concurrent, max waiting)
+DEFAULT_LIMITS = {
+    "read": (64, 256),
+    "write": (16, 64),
+    "auth": (4, 16),
+    "expensive": (4, 8),
+}
+# Seconds a queued request may wait for a slot before being shed
+DEFAULT_QUEUE_TIMEOUT = 5.0
+# Seconds advertised to clients in Retry-After on a 503
+DEFAULT_RETRY_AFTER = 1
+
+# (method, route template) -> class, keyed exactly as the routes are registered in main.py.
+# Requests resolving to any other route bypass admission.
+ROUTE_CLASSES = {
+    ("GET", "/paste/{title}"): "read",
+    ("GET", "/user/pastes"): "read",
+    ("POST", "/paste"): "write",
+    ("PUT", "/paste"): "write",
+    ("DELETE", "/paste/{title}"): "write",
+    ("POST", "/logout"): "write",
+    ("POST", "/register"): "auth",
+    ("POST", "/login"): "auth",
+    ("DELETE", "/delete-account"): "auth",
+    ("GET", "/pastes"): "expensive",
+    ("GET", "/generate-qr"): "expensive",
+}
+# API routes that deliberately bypass admission
+UNCLASSIFIED_ROUTES = {
+    ("GET", "/health"),
+}
+UNCLASSIFIED_PREFIXES = ("/admin/", "/metrics/")
+
+_limiters = None
+_disabled = None
+_retry_after = None
+
+
+def _env_int(name: str, default: int, minimum: int) -> int:
+    v = os.getenv(name)
+    if not v:
+        return default
+    try:
+        n = int(v)
+        if n < minimum:
+            n = default
+    except Exception:
+        n = default
+    return n
+
+
+def _env_float(name: str, default: float) -> float:
+    v = os.getenv(name)
+    if not v:
+        return default
+    try:
+        n = float(v)
+        if n <= 0:
+            n = default
+    except Exception:
+        n = default
+    return n
+
+
+class ClassLimiter:
+    """Concurrency limit with a bounded wait queue for one route class."""
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._sem = asyncio.Semaphore(concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+
+    async def acquire(self) -> bool:
+        """Returns True once a slot is held, False if the request should be shed."""
+        if self._sem.locked():
+            if self.waiting >= self.max_queue:
+                self.shed_queue_full += 1
+                return False
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._sem.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.shed_timeout += 1
+                return False
+            finally:
+                self.waiting -= 1
+        else:
+            await self._sem.acquire()
+        self.in_flight += 1
+        self.admitted += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self._sem.release()
+
+    def metrics(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "admitted": self.admitted,
+            "shed": self.shed_queue_full + self.shed_timeout,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+        }
+
+
+def get_limiters() -> dict:
+    """Build per-class limiters from env on first use.
+
+    Each class reads ADMISSION_<CLASS>_CONCURRENCY and ADMISSION_<CLASS>_QUEUE;
+    ADMISSION_QUEUE_TIMEOUT sets the maximum wait in seconds for all classes.
+    """
+    global _limiters
+    if _limiters is not None:
+        return _limiters
+    queue_timeout = _env_float("ADMISSION_QUEUE_TIMEOUT", DEFAULT_QUEUE_TIMEOUT)
+    limiters = {}
+    for name in CLASSES:
+        default_concurrency, default_queue = DEFAULT_LIMITS[name]
+        prefix = f"ADMISSION_{name.upper()}"
+        concurrency = _env_int(f"{prefix}_CONCURRENCY", default_concurrency, 1)
+        max_queue = _env_int(f"{prefix}_QUEUE", default_queue, 0)
+        limiters[name] = ClassLimiter(name, concurrency, max_queue, queue_timeout)
+    _limiters = limiters
+    return _limiters
+
+
+def is_disabled() -> bool:
+    """Honors DISABLE_ADMISSION=1 to bypass checks."""
+    global _disabled
+    if _disabled is None:
+        _disabled = os.getenv("DISABLE_ADMISSION") == "1"
+    return _disabled
+
+
+def get_retry_after() -> int:
+    global _retry_after
+    if _retry_after is None:
+        _retry_after = _env_int("ADMISSION_RETRY_AFTER", DEFAULT_RETRY_AFTER, 1)
+    return _retry_after
+
+
+def route_template(scope):
+    """Resolve a request to the (method, path template) of the route it matches, or None."""
+    router = getattr(scope.get("app"), "router", None)
+    for route in getattr(router, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return scope["method"], getattr(route, "path", "") or "/"
+    return None
+
+
+def classify(scope):
+    """Returns the route class for a request, or None if it bypasses admission."""
+    key = route_template(scope)
+    if key is None:
+        return None
+    return ROUTE_CLASSES.get(key)
+
+
+def check_route_classes(app):
+    """Warn about registered API routes that have no admission class."""
+    for route in app.router.routes:
+        path = getattr(route, "path", None)
+        methods = getattr(route, "methods", None)
+        if not path or not methods or not getattr(route, "include_in_schema", False):
+            continue
+        if path.startswith(UNCLASSIFIED_PREFIXES):
+            continue
+        for method in sorted(methods):
+            key = (method, path)
+            if key not in ROUTE_CLASSES and key not in UNCLASSIFIED_ROUTES:
+                logger.warning("Route %s %s has no admission class and bypasses admission control", method, path)
+
+
+def get_admission_metrics() -> dict:
+    return {name: limiter.metrics() for name, limiter in get_limiters().items()}
+
+
+class AdmissionMiddleware:
+    """ASGI middleware that sheds requests with a fast 503 once a route class is saturated."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or is_disabled():
+            await self.app(scope, receive, send)
+            return
+
+        name = classify(scope)
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        limiter = get_limiters()[name]
+        if not await limiter.acquire():
+            response = ORJSONResponse(
+                status_code=503,
+                content={"message": "Server busy, retry later"},
+                headers={"Retry-After": str(get_retry_after())},
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
@@ -1,4 +1,6 @@
 from fastapi import HTTPException, status, Request
+import os
+import secrets
 
 async def require_session(request: Request):
     """Require a server-side session cookie."""
@@ -13,3 +15,16 @@ async def require_session(request: Request):
         return {"type": "session", "user_id": user_id}
 
     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or missing session")
+
+async def require_admin(request: Request):
+    """Require the X-Admin-Token header to match ADMIN_TOKEN. Admin routes are disabled when unset."""
+
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+    supplied = request.headers.get("X-Admin-Token") or ""
+    if not secrets.compare_digest(supplied.encode(), token.encode()):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or missing admin token")
+
+    return {"type": "admin"}
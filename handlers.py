@@ -2,8 +2,10 @@ from fastapi import Request, Depends, Response, HTTPException
 from fastapi.responses import ORJSONResponse
 from db_sqlalchemy import database, pastes, users
 from models_sql import UserCreate
-from auth import require_session
+from auth import require_session, require_admin
 from rate_limit import check_and_record_rate_limit, get_ip_address
+from admission import get_admission_metrics
+import profiler
 from sqlalchemy import insert, select, and_, or_, delete
 from datetime import datetime, timezone, timedelta
 import os
@@ -402,3 +404,63 @@ async def health_handler():
         return ORJSONResponse(status_code=500, content={"message": {"status":"error","db_status":"corrupted"}})
     return {"status":"ok","db_status":"ok"}
 
+async def admission_metrics_handler(auth=Depends(require_admin)):
+    return ORJSONResponse(content=get_admission_metrics())
+
+async def profiler_status_handler(auth=Depends(require_admin)):
+    return ORJSONResponse(content=profiler.get_profiler_status())
+
+async def profiler_start_handler(request: Request, auth=Depends(require_admin)):
+    hz = profiler.get_sample_hz()
+    v = request.query_params.get("hz")
+    if v:
+        try:
+            hz = int(v)
+        except ValueError:
+            hz = 0
+        if hz < 1 or hz > profiler.MAX_SAMPLE_HZ:
+            return ORJSONResponse(status_code=400, content={"message": f"hz must be between 1 and {profiler.MAX_SAMPLE_HZ}"})
+    if not profiler.start_sampling(hz):
+        return ORJSONResponse(status_code=409, content={"message": "Profiler already running"})
+    return ORJSONResponse(content=profiler.get_profiler_status())
+
+async def profiler_stop_handler(auth=Depends(require_admin)):
+    if not profiler.stop_sampling():
+        return ORJSONResponse(status_code=409, content={"message": "Profiler not running"})
+    return ORJSONResponse(content=profiler.get_profiler_status())
+
+async def profiler_stacks_handler(request: Request, auth=Depends(require_admin)):
+    route = request.query_params.get("route")
+    return Response(content=profiler.get_collapsed_stacks(route), media_type="text/plain")
+
+async def profiler_capture_handler(request: Request, auth=Depends(require_admin)):
+    route = request.query_params.get("route")
+    if not route:
+        return ORJSONResponse(status_code=400, content={"message": "Missing 'route', e.g. 'GET /paste/{title}'"})
+    try:
+        count = int(request.query_params.get("count") or 1)
+    except ValueError:
+        count = 0
+    if count < 1:
+        return ORJSONResponse(status_code=400, content={"message": "count must be a positive integer"})
+    if not profiler.is_route_label(request.app, route):
+        return ORJSONResponse(status_code=400, content={"message": f"Unknown route '{route}'"})
+    if not profiler.arm_capture(route, count):
+        return ORJSONResponse(status_code=409, content={"message": "Capture in progress"})
+    return ORJSONResponse(content=profiler.get_profiler_status())
+
+async def profiler_capture_stats_handler(request: Request, auth=Depends(require_admin)):
+    sort = request.query_params.get("sort") or "cumulative"
+    if not profiler.capture_complete():
+        return ORJSONResponse(status_code=409, content={"message": "Capture in progress"})
+    try:
+        stats = profiler.get_capture_stats(sort)
+    except KeyError:
+        return ORJSONResponse(status_code=400, content={"message": "Invalid sort key"})
+    if stats is None:
+        return ORJSONResponse(status_code=404, content={"message": "No capture available"})
+    return Response(content=stats, media_type="text/plain")
+
+async def profiler_capture_disarm_handler(auth=Depends(require_admin)):
+    profiler.disarm_capture()
+    return ORJSONResponse(content=profiler.get_profiler_status())
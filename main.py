@@ -6,10 +6,14 @@ from contextlib import asynccontextmanager
 from starlette.middleware.sessions import SessionMiddleware
 import secrets
 import db_sqlalchemy
+from admission import AdmissionMiddleware, check_route_classes
+import profiler
 from handlers import (
     create_paste_handler, get_paste_handler, delete_paste_handler, list_pastes_handler,
     list_user_pastes_handler, register_handler, login_handler, logout_handler,
-    delete_account_handler, generate_qr_handler, health_handler
+    delete_account_handler, generate_qr_handler, health_handler, admission_metrics_handler,
+    profiler_status_handler, profiler_start_handler, profiler_stop_handler, profiler_stacks_handler,
+    profiler_capture_handler, profiler_capture_stats_handler, profiler_capture_disarm_handler
 )
 
 # load env
@@ -25,12 +29,19 @@ async def lifespan(app: FastAPI):
     # startup
     await db_sqlalchemy.init_db()
     await db_sqlalchemy.database.connect()
+    check_route_classes(app)
+    # SIGUSR1 toggles the sampling profiler
+    profiler.install_signal_handler()
     yield
     # shutdown
     await db_sqlalchemy.database.disconnect()
 
 # Create FastAPI app
 app = FastAPI(title="Chiyogami FastAPI Port - Backend", lifespan=lifespan)
+# Profiler sits inside admission so captures exclude queue wait
+app.add_middleware(profiler.ProfilerMiddleware)
+# Admission control sits inside CORS so shed 503s still carry CORS headers
+app.add_middleware(AdmissionMiddleware)
 app.add_middleware(SessionMiddleware, secret_key=SECRET_KEY)
 
 # CORS - allow all origins in dev, configure in production
@@ -55,6 +66,14 @@ app.post("/logout")(logout_handler)
 app.delete("/delete-account")(delete_account_handler)
 app.get("/generate-qr")(generate_qr_handler)
 app.get("/health")(health_handler)
+app.get("/metrics/admission")(admission_metrics_handler)
+app.get("/admin/profiler")(profiler_status_handler)
+app.post("/admin/profiler/start")(profiler_start_handler)
+app.post("/admin/profiler/stop")(profiler_stop_handler)
+app.get("/admin/profiler/stacks")(profiler_stacks_handler)
+app.post("/admin/profiler/capture")(profiler_capture_handler)
+app.get("/admin/profiler/capture")(profiler_capture_stats_handler)
+app.delete("/admin/profiler/capture")(profiler_capture_disarm_handler)
 
 # Serve simple static pages similar to Go's public/ mapping
 @app.get("/list", include_in_schema=False)
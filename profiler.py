@@ -0,0 +1,288 @@
+import os
+import io
+import sys
+import time
+import signal
+import asyncio
+import cProfile
+import pstats
+import threading
+import logging
+from admission import route_template
+
+# Default sampling rate in Hz
+DEFAULT_SAMPLE_HZ = 100
+MAX_SAMPLE_HZ = 1000
+# Stack label used for samples taken while no request task is running
+NO_REQUEST = "(no request)"
+
+# Set while the sampler runs or a cProfile capture is armed; the middleware
+# checks only this flag when profiling is off.
+_active = False
+
+_sampler = None
+# Map asyncio task -> route label, only populated while sampling
+_task_routes = {}
+# Map collapsed stack ("route;frame;frame") -> sample count
+_stacks = {}
+_stacks_lock = threading.Lock()
+
+# Pending cProfile capture
+_capture_route = None
+_capture_remaining = 0
+_capture_profile = None
+_capture_running = False
+_capture_requests = 0
+_capture_error = None
+
+logger = logging.getLogger(__name__)
+
+
+def get_sample_hz() -> int:
+    v = os.getenv("PROFILER_SAMPLE_HZ")
+    if not v:
+        return DEFAULT_SAMPLE_HZ
+    try:
+        n = int(v)
+        if n < 1 or n > MAX_SAMPLE_HZ:
+            n = DEFAULT_SAMPLE_HZ
+    except Exception:
+        n = DEFAULT_SAMPLE_HZ
+    return n
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _Sampler(threading.Thread):
+    """Background thread that periodically snapshots the event-loop thread's stack."""
+
+    def __init__(self, loop, thread_id: int, hz: int):
+        super().__init__(name="profiler-sampler", daemon=True)
+        self.loop = loop
+        self.thread_id = thread_id
+        self.hz = hz
+        self.samples = 0
+        self.started_at = time.time()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        interval = 1.0 / self.hz
+        while not self._stop_event.wait(interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            task = asyncio.current_task(self.loop)
+            route = _task_routes.get(task, NO_REQUEST) if task is not None else NO_REQUEST
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(route)
+            key = ";".join(reversed(labels))
+            with _stacks_lock:
+                _stacks[key] = _stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def _refresh_active():
+    global _active
+    _active = _sampler is not None or _capture_remaining > 0
+
+
+def start_sampling(hz: int = None) -> bool:
+    """Start sampling the calling event loop. Returns False if already running.
+
+    Must be called from the event-loop thread. Clears previously collected stacks.
+    """
+    global _sampler
+    if _sampler is not None:
+        return False
+    if hz is None:
+        hz = get_sample_hz()
+    with _stacks_lock:
+        _stacks.clear()
+    _sampler = _Sampler(asyncio.get_running_loop(), threading.get_ident(), hz)
+    _sampler.start()
+    _refresh_active()
+    return True
+
+
+def stop_sampling() -> bool:
+    """Stop the sampler, keeping collected stacks. Returns False if not running."""
+    global _sampler
+    if _sampler is None:
+        return False
+    _sampler.stop()
+    _sampler = None
+    _task_routes.clear()
+    _refresh_active()
+    return True
+
+
+def toggle_sampling():
+    if _sampler is None:
+        start_sampling()
+    else:
+        stop_sampling()
+
+
+def install_signal_handler(sig=getattr(signal, "SIGUSR1", None)):
+    """Toggle sampling on `sig` (SIGUSR1 by default). No-op where unsupported."""
+    if sig is None:
+        return
+    try:
+        asyncio.get_running_loop().add_signal_handler(sig, toggle_sampling)
+    except (NotImplementedError, RuntimeError, ValueError):
+        pass
+
+
+def get_collapsed_stacks(route: str = None) -> str:
+    """Returns samples in collapsed-stack format, one `frames count` line per stack.
+
+    The first frame of each stack is the route label, so output can be fed
+    straight to flamegraph.pl or speedscope.
+    """
+    with _stacks_lock:
+        items = sorted(_stacks.items())
+    lines = []
+    for key, count in items:
+        if route is not None and not key.startswith(route + ";"):
+            continue
+        lines.append(f"{key} {count}")
+    return "\n".join(lines) + ("\n" if lines else "")
+
+
+def arm_capture(route: str, count: int) -> bool:
+    """Profile the next `count` requests whose route label equals `route` with cProfile.
+
+    Returns False while a captured request is still running.
+    """
+    global _capture_route, _capture_remaining, _capture_profile, _capture_requests, _capture_error
+    if _capture_running:
+        return False
+    _capture_route = route
+    _capture_remaining = count
+    _capture_profile = cProfile.Profile()
+    _capture_requests = 0
+    _capture_error = None
+    _refresh_active()
+    return True
+
+
+def disarm_capture():
+    """Drop any requests still pending capture; a request already being profiled finishes."""
+    global _capture_remaining
+    _capture_remaining = 0
+    _refresh_active()
+
+
+def is_route_label(app, label: str) -> bool:
+    """True if `label` names a registered route, e.g. `GET /paste/{title}`."""
+    for route in app.router.routes:
+        path = getattr(route, "path", None)
+        for method in getattr(route, "methods", None) or ():
+            if label == f"{method} {path}":
+                return True
+    return False
+
+
+def capture_complete() -> bool:
+    """True once every armed request has finished being profiled."""
+    return _capture_remaining == 0 and not _capture_running
+
+
+def get_capture_stats(sort: str = "cumulative", limit: int = 50):
+    """Returns pstats text for the last complete capture, or None if there is none.
+
+    Must not be called while a capture is in progress: building the stats
+    disables the profiler.
+    """
+    if not capture_complete() or _capture_profile is None or _capture_requests == 0:
+        return None
+    buf = io.StringIO()
+    stats = pstats.Stats(_capture_profile, stream=buf)
+    stats.sort_stats(sort).print_stats(limit)
+    return buf.getvalue()
+
+
+def get_profiler_status() -> dict:
+    return {
+        "sampling": _sampler is not None,
+        "sample_hz": _sampler.hz if _sampler is not None else None,
+        "samples": _sampler.samples if _sampler is not None else None,
+        "stacks": len(_stacks),
+        "capture_route": _capture_route,
+        "capture_remaining": _capture_remaining,
+        "capture_requests": _capture_requests,
+        "capture_running": _capture_running,
+        "capture_complete": _capture_profile is not None and _capture_error is None and capture_complete(),
+        "capture_error": _capture_error,
+    }
+
+
+def route_label(scope) -> str:
+    """Resolve the matching route template, e.g. `GET /paste/{title}`."""
+    key = route_template(scope)
+    if key is None:
+        return f"{scope['method']} (unmatched)"
+    return f"{key[0]} {key[1]}"
+
+
+class ProfilerMiddleware:
+    """ASGI middleware tagging request tasks with their route for the sampler and
+    running armed cProfile captures. Passes straight through while profiling is off.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not _active or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = route_label(scope)
+        task = asyncio.current_task()
+        sampling = _sampler is not None
+        if sampling:
+            _task_routes[task] = route
+        try:
+            if _capture_remaining > 0 and not _capture_running and route == _capture_route:
+                await self._run_captured(scope, receive, send)
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            if sampling:
+                _task_routes.pop(task, None)
+
+    async def _run_captured(self, scope, receive, send):
+        global _capture_remaining, _capture_running, _capture_requests, _capture_error
+        # Captured requests are profiled one at a time; requests that overlap
+        # a running capture are left uncounted for a later slot. cProfile covers
+        # the whole thread, so other tasks run while this request awaits are
+        # recorded too.
+        profile = _capture_profile
+        try:
+            profile.enable()
+        except ValueError as e:
+            # another profiler is already active on this thread
+            logger.warning("cProfile capture disarmed: %s", e)
+            _capture_error = str(e)
+            disarm_capture()
+            await self.app(scope, receive, send)
+            return
+        _capture_remaining -= 1
+        _capture_running = True
+        _refresh_active()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profile.disable()
+            _capture_running = False
+            _capture_requests += 1